@@ -6,19 +6,22 @@
 
 import argparse
 import copy
+import json
 import time
 from pathlib import Path
 from typing import Dict
 
 import numpy as np
+from open3d import pipelines
 
 from matcher.ransac import (
     compute_feature_correspondences,
     compute_step_transformation,
     evaluate_inlier_ratio,
     global_registration,
+    run_ransac_batched,
 )
-from ply import Ply
+from ply import Ply, load_ply_pair
 from src.utils.profiler import Profiler, profile_block
 from utils.setup_logging import setup_logging
 
@@ -42,9 +45,9 @@ def benchmark_preprocessing(src_path: Path, tgt_path: Path) -> Dict[str, float]:
     timings = {}
 
     # PLY読み込み
+    # 最適化: ソースとターゲットの前処理は独立しているため並行実行する
     with profile_block("ply_loading"):
-        src_ply = Ply(src_path)
-        tgt_ply = Ply(tgt_path)
+        src_ply, tgt_ply = load_ply_pair(src_path, tgt_path)
 
     timings["ply_loading"] = Profiler.get_stats("ply_loading").total_time
 
@@ -202,6 +205,130 @@ def benchmark_full_ransac(
     return timings
 
 
+def benchmark_batched_ransac(
+    src_ply: Ply, tgt_ply: Ply, correspondences, voxel_size: float = 0.3, num_iterations: int = 10000
+) -> Dict[str, float]:
+    """バッチ化NumPy実装RANSACのベンチマーク（Open3D組み込み版との比較用）。
+
+    run_ransac_batched は仮説生成と検証をバッチ演算にまとめ、
+    適応的収束判定で早期終了するNumPy実装。Open3D組み込み版（Phase 6）と
+    同じ対応点を入力に使い、所要時間とfitnessを並べて比較できるようにする。
+
+    Args:
+        src_ply: ソース点群
+        tgt_ply: ターゲット点群
+        correspondences: 対応点リスト（Phase 2の結果を再利用）
+        voxel_size: ボクセルサイズ
+        num_iterations: 最大イテレーション数（= 評価する仮説の総数上限）
+
+    Returns:
+        実行時間を含む辞書
+    """
+    logger.info(f"=== Benchmarking Batched RANSAC (max iterations={num_iterations}) ===")
+
+    with profile_block("batched_ransac"):
+        result = run_ransac_batched(src_ply, tgt_ply, correspondences, voxel_size, iteration=num_iterations)
+
+    timings = {"batched_ransac": Profiler.get_stats("batched_ransac").total_time}
+
+    logger.info(f"  Total time: {timings['batched_ransac']:.4f}s")
+    logger.info(f"  Fitness: {result.fitness:.4f}")
+
+    return timings
+
+
+def run_kdtree_params_comparison(
+    src_ply: Ply,
+    tgt_ply: Ply,
+    voxel_size: float = 0.3,
+    param_grid: list[tuple[float, int]] | None = None,
+    cache_path: Path | None = None,
+) -> Dict[str, float]:
+    """FPFH計算のKDTreeパラメータを掃引し、計算時間と対応点数を比較する。
+
+    最適化: 設定ごとにPlyを作り直すとPLY読み込みとダウンサンプリングを
+    毎回やり直すことになるため、前処理済みの pcd_down を全設定で共有し、
+    FPFH計算のみを Ply.recompute_fpfh でやり直す。
+
+    cache_path を指定すると計測結果がJSONに永続化され、次回以降の実行では
+    計測済みの設定がスキップされる（プロセスを跨いだ再計算の回避）。
+    キャッシュのキーには入力ファイル名・mtime・voxel_sizeが含まれるため、
+    異なる入力の結果と混ざらず、入力ファイルの更新時は自動的に再計測される。
+
+    Args:
+        src_ply: ソース点群（前処理済み）
+        tgt_ply: ターゲット点群（前処理済み）
+        voxel_size: ボクセルサイズ（探索半径の基準）
+        param_grid: (radius倍率, max_nn) のリスト。Noneの場合はデフォルトの4設定
+        cache_path: 計測結果を永続化するJSONファイルのパス。Noneでキャッシュ無効
+
+    Returns:
+        設定名 → FPFH計算時間（src+tgt合計、秒）の辞書
+    """
+    if param_grid is None:
+        # デフォルト設定 (5.0, 100) を中心に粗い設定から密な設定まで掃引する
+        param_grid = [(2.5, 50), (5.0, 100), (7.5, 150), (10.0, 200)]
+
+    logger.info("=== KDTree Params Comparison (FPFH) ===")
+    timings: Dict[str, float] = {}
+
+    # 計測済み設定のJSONキャッシュ: キー → [所要時間, 対応点数]
+    cached_results: Dict[str, list] = {}
+    if cache_path is not None and cache_path.exists():
+        with cache_path.open("r", encoding="utf-8") as f:
+            cached_results = json.load(f)
+
+    # 入力PLYのmtimeをキーに含め、ファイルを編集・再生成した場合に
+    # 古い計測値が返り続けないようにする（キャッシュの自動無効化）
+    src_mtime = src_ply.path.stat().st_mtime_ns
+    tgt_mtime = tgt_ply.path.stat().st_mtime_ns
+
+    def setting_key(radius_mult: float, max_nn: int) -> str:
+        return (
+            f"{src_ply.path.name}@{src_mtime}:{tgt_ply.path.name}@{tgt_mtime}"
+            f":v{voxel_size}:r{radius_mult}:nn{max_nn}"
+        )
+
+    def run_setting(radius_mult: float, max_nn: int) -> tuple[float, int]:
+        """1設定分のFPFH計算＋対応点計算を実行し、(所要時間, 対応点数)を返す。"""
+        radius = voxel_size * radius_mult
+        start = time.perf_counter()
+        src_fpfh = src_ply.recompute_fpfh(radius, max_nn)
+        tgt_fpfh = tgt_ply.recompute_fpfh(radius, max_nn)
+        elapsed = time.perf_counter() - start
+        corres = pipelines.registration.correspondences_from_features(src_fpfh, tgt_fpfh, False)
+        return elapsed, len(corres)
+
+    # キャッシュ済みの設定は再計算せず、未計測の設定だけを実行する
+    pending = [(rm, nn) for rm, nn in param_grid if setting_key(rm, nn) not in cached_results]
+
+    # 設定ごとの実行は意図的に直列にする: Open3DのFPFHカーネル自体が
+    # マルチスレッドのため、設定同士をスレッドプールで重ねるとコアの
+    # 奪い合いで各設定のwall-clock計測が（設定ごとに不均一に）歪み、
+    # 掃引の目的である設定間の比較が成り立たなくなる。
+    # 再計算の回避はJSONキャッシュ側が担う
+    for radius_mult, max_nn in pending:
+        elapsed, n_corres = run_setting(radius_mult, max_nn)
+        cached_results[setting_key(radius_mult, max_nn)] = [elapsed, n_corres]
+
+    for radius_mult, max_nn in param_grid:
+        name = f"fpfh_r{radius_mult}_nn{max_nn}"
+        elapsed, n_corres = cached_results[setting_key(radius_mult, max_nn)]
+        was_cached = (radius_mult, max_nn) not in pending
+        timings[name] = elapsed
+        logger.info(
+            f"  radius={voxel_size * radius_mult:.2f} max_nn={max_nn}: "
+            f"{elapsed:.4f}s, {n_corres:,} correspondences{' (cached)' if was_cached else ''}"
+        )
+
+    if cache_path is not None:
+        with cache_path.open("w", encoding="utf-8") as f:
+            json.dump(cached_results, f, indent=2)
+        logger.info(f"  Sweep results persisted to: {cache_path}")
+
+    return timings
+
+
 def estimate_10k_iteration_time(avg_iteration_time: float, sleep_time: float = 0.03) -> None:
     """10,000イテレーションRANSACの推定実行時間を計算。
 
@@ -267,6 +394,9 @@ def run_comprehensive_benchmark(
     # Phase 6: フルRANSACパイプライン
     full_timings = benchmark_full_ransac(src_ply, tgt_ply, voxel_size, full_ransac_iterations)
 
+    # Phase 7: バッチ化NumPy実装RANSAC（Phase 6の組み込み版との比較）
+    benchmark_batched_ransac(src_ply, tgt_ply, corres, voxel_size)
+
     # 10,000イテレーションの推定時間
     estimate_10k_iteration_time(iter_timings["ransac_iteration"], sleep_timings["sleep"])
 
@@ -319,6 +449,17 @@ def main():
         default=30,
         help="Number of RANSAC iterations for full pipeline (default: 30)",
     )
+    parser.add_argument(
+        "--kdtree-comparison",
+        action="store_true",
+        help="Run the FPFH KDTree parameter sweep instead of the full benchmark suite",
+    )
+    parser.add_argument(
+        "--kdtree-cache",
+        type=str,
+        default=None,
+        help="JSON file to persist sweep timings; previously measured settings are skipped",
+    )
 
     args = parser.parse_args()
 
@@ -333,6 +474,14 @@ def main():
         logger.error(f"Target file not found: {tgt_path}")
         return
 
+    if args.kdtree_comparison:
+        # 前処理は1回だけ実行し、全設定でpcd_downを共有する
+        src_ply = Ply(src_path, args.voxel_size)
+        tgt_ply = Ply(tgt_path, args.voxel_size)
+        cache_path = Path(args.kdtree_cache) if args.kdtree_cache else None
+        run_kdtree_params_comparison(src_ply, tgt_ply, args.voxel_size, cache_path=cache_path)
+        return
+
     run_comprehensive_benchmark(
         src_path,
         tgt_path,
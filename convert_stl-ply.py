@@ -1,11 +1,31 @@
+from pathlib import Path
+
 import trimesh
 
-mesh = trimesh.load_mesh("3d_data/Tooth36_full.stl")
 
-vertices = mesh.vertices
-pcd = trimesh.PointCloud(vertices)
+def convert_stl_to_ply(input_path: str, output_path: str) -> None:
+    """STLメッシュの頂点を点群としてPLYファイルに書き出す。
+
+    出力キャッシュ: 出力PLYが既に存在し、入力STLより新しい場合は
+    変換済みとみなして再変換をスキップする（メッシュの読み込みと
+    エクスポートは点数に比例して重いため）。
+    """
+    input_file = Path(input_path)
+    output_file = Path(output_path)
+
+    if output_file.exists() and output_file.stat().st_mtime >= input_file.stat().st_mtime:
+        print(f"スキップ: {output_path} は {input_path} より新しいため変換済みです")
+        return
+
+    mesh = trimesh.load_mesh(input_path)
+
+    vertices = mesh.vertices
+    pcd = trimesh.PointCloud(vertices)
+
+    pcd_byte = trimesh.exchange.ply.export_ply(pcd, encoding="ascii")
+    with output_file.open("wb+") as f:
+        f.write(pcd_byte)
+
 
-pcd_byte = trimesh.exchange.ply.export_ply(pcd, encoding="ascii")
-output_file = open("3d_data/Tooth36_full.ply", "wb+")
-output_file.write(pcd_byte)
-output_file.close()
+if __name__ == "__main__":
+    convert_stl_to_ply("3d_data/Tooth36_full.stl", "3d_data/Tooth36_full.ply")
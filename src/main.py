@@ -11,7 +11,7 @@ from pathlib import Path
 
 from matcher.icp import refine_registration
 from matcher.ransac import global_registration
-from ply import Ply
+from ply import load_ply_pair
 from utils.setup_logging import setup_logging
 from visualization.draw_registration_result import draw_registration_result
 
@@ -27,8 +27,8 @@ def main() -> None:
     tgt_path = DATA_DIRECTORY / "target.ply"
 
     # PLYファイルの読み込みと前処理（ダウンサンプル、法線推定、FPFH特徴量計算）
-    src_ply = Ply(src_path)
-    tgt_ply = Ply(tgt_path)
+    # ソースとターゲットは独立しているため2スレッドで並行実行する
+    src_ply, tgt_ply = load_ply_pair(src_path, tgt_path)
 
     # Step 1: RANSACによるグローバルレジストレーション（特徴量ベースの粗い位置合わせ）
     init_trans = global_registration(src_ply, tgt_ply).transformation
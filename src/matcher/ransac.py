@@ -5,17 +5,252 @@ FPFH特徴量を用いた対応点マッチングとRANSACアルゴリズムに
 
 主な機能:
     - global_registration: Open3DのRANSACパイプラインによるレジストレーション
+    - global_registration_without_fpfh: FPFHを使わず3D最近傍対応によるレジストレーション
     - compute_feature_correspondences: FPFH特徴量による対応点計算（ノイズ混入機能付き）
     - compute_step_transformation: Kabschアルゴリズムによる変換行列推定（NumPy実装）
+    - run_ransac_batched: 仮説生成・検証をバッチ化したNumPy実装のRANSAC
     - evaluate_inlier_ratio: 変換行列の品質をインライア率で評価
+    - compute_required_iterations: RANSAC理論に基づく適応的な必要イテレーション数の計算
 """
 
 import numpy as np
 import open3d as o3d
+import open3d.core as o3c
 from open3d import pipelines
 
 from ply import Ply
 
+# numbaはオプション依存: インストールされている場合のみJITカーネルを有効化する。
+# 不在時もnjit / prangeに無害な代替を束縛し、シンボル未定義のままにしない
+# （JITカーネルの定義自体はHAS_NUMBAでガードされるため実行はされない）
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args: object, **kwargs: object):
+        """numba不在時のダミーデコレータ（関数を無変換で返す）。"""
+
+        def wrap(func):
+            return func
+
+        return wrap
+
+
+# faissはオプション依存: インストールされている場合のみ特徴量マッチングに使用する
+try:
+    import faiss
+
+    HAS_FAISS = True
+except ImportError:
+    faiss = None
+    HAS_FAISS = False
+
+
+if HAS_NUMBA:
+
+    @njit(cache=True)
+    def _count_inliers_jit(
+        p_src: np.ndarray,
+        p_tgt: np.ndarray,
+        rotation: np.ndarray,
+        translation: np.ndarray,
+        dist_thresh_sq: float,
+    ) -> int:
+        """変換適用と平方距離フィルタを単一ループに融合したJITカーネル。
+
+        NumPy版は変換後の点群と差分の中間配列を確保するが、本カーネルは
+        点ごとに変換・平方距離・閾値判定を融合して実行するため
+        中間配列の確保が不要で、キャッシュ効率が良い。
+
+        Args:
+            p_src: ソース点の配列 (N, 3)
+            p_tgt: ターゲット点の配列 (N, 3)
+            rotation: 回転行列 (3, 3)
+            translation: 平行移動ベクトル (3,)
+            dist_thresh_sq: 距離閾値の2乗
+
+        Returns:
+            インライア数
+        """
+        count = 0
+        for i in range(p_src.shape[0]):
+            x = p_src[i, 0]
+            y = p_src[i, 1]
+            z = p_src[i, 2]
+            dx = rotation[0, 0] * x + rotation[0, 1] * y + rotation[0, 2] * z + translation[0] - p_tgt[i, 0]
+            dy = rotation[1, 0] * x + rotation[1, 1] * y + rotation[1, 2] * z + translation[1] - p_tgt[i, 1]
+            dz = rotation[2, 0] * x + rotation[2, 1] * y + rotation[2, 2] * z + translation[2] - p_tgt[i, 2]
+            if dx * dx + dy * dy + dz * dz < dist_thresh_sq:
+                count += 1
+        return count
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _nearest_feature_indices_jit(query_rows: np.ndarray, ref_rows: np.ndarray) -> np.ndarray:
+        """特徴量空間での全探索最近傍をクエリ点並列で計算するJITカーネル。
+
+        33次元float32記述子のL2平方距離を内側ループで積算し、
+        prangeでクエリ点をコア間に分割する。fastmathにより内積の積和が
+        FMA/SIMD命令に落ち、NumPyのブロードキャストによる
+        (N, M) 距離行列の実体化も不要になる。
+
+        Args:
+            query_rows: クエリ記述子の行列 (N, D)、C連続のfloat32
+            ref_rows: 参照記述子の行列 (M, D)、C連続のfloat32
+
+        Returns:
+            各クエリ記述子に最も近い参照記述子のインデックス配列 (N,)
+        """
+        n = query_rows.shape[0]
+        m = ref_rows.shape[0]
+        dim = query_rows.shape[1]
+        nearest = np.empty(n, dtype=np.int64)
+        for i in prange(n):
+            best_dist = np.inf
+            best_idx = 0
+            for j in range(m):
+                dist = 0.0
+                for k in range(dim):
+                    diff = query_rows[i, k] - ref_rows[j, k]
+                    dist += diff * diff
+                if dist < best_dist:
+                    best_dist = dist
+                    best_idx = j
+            nearest[i] = best_idx
+        return nearest
+
+
+def _feature_rows(feature: pipelines.registration.Feature) -> np.ndarray:
+    """FPFH特徴量を点ごとの行が連続する (N, 33) のfloat32行列として取り出す。
+
+    Open3DのFeature.dataは次元優先の (33, N) レイアウトのため、
+    ある1点の33次元記述子がメモリ上でN要素おきに飛び飛びに配置されている。
+    記述子のバッチマッチングは点単位で記述子全体を読むアクセスパターンのため、
+    転置してC連続に詰め直し、1点分の記述子がキャッシュライン上に
+    連続して乗るレイアウトに入れ替える。float32への縮小でメモリ帯域も半減する。
+
+    Args:
+        feature: Open3DのFPFH特徴量オブジェクト
+
+    Returns:
+        (N, 33) のC連続なfloat32行列
+    """
+    return np.ascontiguousarray(feature.data.T, dtype=np.float32)
+
+
+def _match_features_faiss(
+    src_rows: np.ndarray,
+    tgt_rows: np.ndarray,
+    mutual_filter: bool,
+) -> np.ndarray:
+    """FAISSの平坦L2インデックスで特徴量の最近傍マッチングを一括実行する。
+
+    全ソース記述子の検索を1回のバッチクエリで行う。FAISSのIndexFlatL2は
+    SIMD化された距離計算とマルチスレッド検索を内蔵しており、
+    記述子数が多い場合にOpen3Dの組み込みマッチングより高速。
+
+    Args:
+        src_rows: ソース記述子の行列 (N, 33)、C連続のfloat32
+        tgt_rows: ターゲット記述子の行列 (M, 33)、C連続のfloat32
+        mutual_filter: Trueの場合、双方向で最近傍となる対応のみ残す
+
+    Returns:
+        対応点ペアの配列 (K, 2)。各行は [src_index, tgt_index]
+
+    Raises:
+        RuntimeError: faissがインストールされていない場合
+    """
+    # 呼び出し側はHAS_FAISSでガード済みのため通常は到達しない
+    if faiss is None:
+        msg = "faiss is not available"
+        raise RuntimeError(msg)
+
+    index_tgt = faiss.IndexFlatL2(tgt_rows.shape[1])
+    index_tgt.add(tgt_rows)
+    _, fwd = index_tgt.search(src_rows, 1)
+    fwd = fwd.ravel()
+
+    n = len(src_rows)
+    if not mutual_filter:
+        corr = np.empty((n, 2), dtype=np.int32)
+        corr[:, 0] = np.arange(n, dtype=np.int32)
+        corr[:, 1] = fwd
+        return corr
+
+    # 双方向フィルタ: 逆方向（ターゲット→ソース）も一括検索し、
+    # 相互に最近傍となっているペアのみ残す
+    index_src = faiss.IndexFlatL2(src_rows.shape[1])
+    index_src.add(src_rows)
+    _, back = index_src.search(tgt_rows, 1)
+    back = back.ravel()
+
+    src_idx = np.arange(n)
+    keep = back[fwd] == src_idx
+    corr = np.empty((int(np.count_nonzero(keep)), 2), dtype=np.int32)
+    corr[:, 0] = src_idx[keep]
+    corr[:, 1] = fwd[keep]
+    return corr
+
+
+def _match_features_numba(
+    src_rows: np.ndarray,
+    tgt_rows: np.ndarray,
+    mutual_filter: bool,
+) -> np.ndarray:
+    """numbaの並列JITカーネルで特徴量の最近傍マッチングを実行する。
+
+    faissが無い環境向けのフォールバック。クエリ並列の全探索カーネルを
+    使うため、Open3Dの組み込みマッチングと異なり全コアを使い切れる。
+    対応ペアの構成と双方向フィルタのロジックはfaiss版と同一。
+
+    Args:
+        src_rows: ソース記述子の行列 (N, 33)、C連続のfloat32
+        tgt_rows: ターゲット記述子の行列 (M, 33)、C連続のfloat32
+        mutual_filter: Trueの場合、双方向で最近傍となる対応のみ残す
+
+    Returns:
+        対応点ペアの配列 (K, 2)。各行は [src_index, tgt_index]
+    """
+    fwd = _nearest_feature_indices_jit(src_rows, tgt_rows)
+
+    n = len(src_rows)
+    if not mutual_filter:
+        corr = np.empty((n, 2), dtype=np.int32)
+        corr[:, 0] = np.arange(n, dtype=np.int32)
+        corr[:, 1] = fwd
+        return corr
+
+    back = _nearest_feature_indices_jit(tgt_rows, src_rows)
+    src_idx = np.arange(n)
+    keep = back[fwd] == src_idx
+    corr = np.empty((int(np.count_nonzero(keep)), 2), dtype=np.int32)
+    corr[:, 0] = src_idx[keep]
+    corr[:, 1] = fwd[keep]
+    return corr
+
+
+def _require_fpfh(src: Ply, tgt: Ply) -> None:
+    """FPFH特徴量を使う処理の前提条件を検証する。
+
+    compute_fpfh=False で初期化したPlyのpcd_fpfhはNoneのため、
+    特徴量ベースの処理に渡すとOpen3D内部の不明瞭なエラーになる。
+    ここで明示的に検出し、原因（初期化フラグ）を示すメッセージで失敗させる。
+
+    Args:
+        src: ソース点群
+        tgt: ターゲット点群
+
+    Raises:
+        ValueError: どちらかの点群にFPFH特徴量が計算されていない場合
+    """
+    for name, ply in (("source", src), ("target", tgt)):
+        if ply.pcd_fpfh is None:
+            msg = f"FPFH features are required but missing on the {name} point cloud ({ply.path}); initialize Ply with compute_fpfh=True"
+            raise ValueError(msg)
+
 
 def global_registration(
     src: Ply,
@@ -36,7 +271,12 @@ def global_registration(
 
     Returns:
         RegistrationResult: 変換行列（transformation）とフィットネス値を含む結果
+
+    Raises:
+        ValueError: src / tgt にFPFH特徴量が計算されていない場合
     """
+    _require_fpfh(src, tgt)
+
     # 対応点の距離閾値: ボクセルサイズの1.5倍をインライア判定基準とする
     dist_thresh = voxel_size * 1.5
     return pipelines.registration.registration_ransac_based_on_feature_matching(
@@ -59,6 +299,88 @@ def global_registration(
     )
 
 
+def global_registration_without_fpfh(
+    src: Ply,
+    tgt: Ply,
+    voxel_size: float,
+    iteration: int = 30,
+    max_corr_dist: float | None = None,
+) -> pipelines.registration.RegistrationResult:
+    """FPFH特徴量を使わず、3D空間での最近傍対応に基づくレジストレーションを実行する。
+
+    各ソース点に対してターゲット点群中の最近傍点を対応点とし、
+    RANSACで剛体変換を推定する。特徴量計算が不要なため前処理が軽いが、
+    初期位置が大きくずれている場合はFPFH版より収束しにくい。
+
+    最適化: 対応点の構築はソース点ごとの search_knn_vector_3d 呼び出しではなく、
+    o3d.core.nns.NearestNeighborSearch による一括クエリで行う。
+    Python/C++境界の往復がN回から1回に減り、C++側のOpenMP並列化も効くため、
+    1万点規模の点群で対応点構築が大幅に高速化される。
+
+    Args:
+        src: ソース点群（前処理済みのPlyオブジェクト）
+        tgt: ターゲット点群（前処理済みのPlyオブジェクト）
+        voxel_size: ボクセルサイズ。距離閾値の算出基準に使用 (閾値 = voxel_size * 1.5)
+        iteration: RANSACの最大イテレーション数（デフォルト: 30）
+        max_corr_dist: 対応点探索の打ち切り半径。指定した場合、全域のKNN探索の
+                       代わりにグリッドベースの固定半径探索（hybrid_search）を使い、
+                       半径内に近傍を持たないソース点は対応点から除外する。
+                       半径が小さいほどKDTreeの全域探索より高速になる
+
+    Returns:
+        RegistrationResult: 変換行列（transformation）とフィットネス値を含む結果
+    """
+    dist_thresh = voxel_size * 1.5
+    src_points = np.asarray(src.pcd_down.points)
+    tgt_points = np.asarray(tgt.pcd_down.points)
+
+    # バッチ化NN探索: ターゲット点群のインデックスを1回だけ構築し、全ソース点を一括検索
+    nns = o3c.nns.NearestNeighborSearch(o3c.Tensor(tgt_points, dtype=o3c.float32))
+    queries = o3c.Tensor(src_points, dtype=o3c.float32)
+    n = len(src_points)
+
+    if max_corr_dist is not None:
+        # 小半径の探索: グリッドで空間を区切るhybrid探索は、探索範囲が半径内に
+        # 限定されるためKDTreeの全域KNN探索より高速（octreeの局所探索に相当）
+        nns.hybrid_index(max_corr_dist)
+        idx_t, _, _ = nns.hybrid_search(queries, max_corr_dist, 1)
+        idx = idx_t.numpy().ravel()
+
+        # 半径内に近傍が見つからなかった点（インデックス -1）を除外
+        valid = idx >= 0
+        corr = np.empty((int(np.count_nonzero(valid)), 2), dtype=np.int32)
+        corr[:, 0] = np.nonzero(valid)[0]
+        corr[:, 1] = idx[valid]
+    else:
+        nns.knn_index()
+        idx_t, _ = nns.knn_search(queries, 1)
+
+        # 最適化: リストへのappendではなく、int32で事前確保した(N, 2)配列に直接書き込む。
+        # Pythonオブジェクトのboxingとdtype変換を避け、メモリ使用量も半減する
+        corr = np.empty((n, 2), dtype=np.int32)
+        corr[:, 0] = np.arange(n, dtype=np.int32)
+        corr[:, 1] = idx_t.numpy().ravel()
+
+    correspondences = o3d.utility.Vector2iVector(corr)
+
+    return pipelines.registration.registration_ransac_based_on_correspondence(
+        src.pcd_down,
+        tgt.pcd_down,
+        correspondences,
+        dist_thresh,
+        pipelines.registration.TransformationEstimationPointToPoint(False),  # スケーリングなしのPoint-to-Point推定
+        3,  # RANSACで使用するサンプル数（3点で剛体変換を推定）
+        [
+            # 対応点間のエッジ長の整合性チェック（比率0.9以上）
+            pipelines.registration.CorrespondenceCheckerBasedOnEdgeLength(0.9),
+            # 対応点間の距離チェック（距離閾値以内）
+            pipelines.registration.CorrespondenceCheckerBasedOnDistance(dist_thresh),
+        ],
+        # 収束条件: 最大イテレーション数と信頼度 0.999
+        pipelines.registration.RANSACConvergenceCriteria(iteration, 0.999),
+    )
+
+
 def compute_feature_correspondences(
     src: Ply,
     tgt: Ply,
@@ -80,10 +402,32 @@ def compute_feature_correspondences(
 
     Returns:
         Vector2iVector: 対応点ペアのリスト。各行は [src_index, tgt_index]
+
+    Raises:
+        ValueError: src / tgt にFPFH特徴量が計算されていない場合
     """
-    # FPFH特徴量空間での最近傍探索による対応点計算
-    corres = pipelines.registration.correspondences_from_features(src.pcd_fpfh, tgt.pcd_fpfh, mutual_filter)
-    corres_np = np.asarray(corres)
+    _require_fpfh(src, tgt)
+
+    # FPFH特徴量空間での最近傍探索による対応点計算。
+    # faissが利用可能な場合はバッチL2インデックス検索で一括マッチングする
+    if HAS_FAISS:
+        # 最適化: Plyが前処理時に作ったfloat32の行優先キャッシュを再利用し、
+        # 呼び出しごとの転置・astypeコピーを省く
+        corres_np = _match_features_faiss(
+            src.fpfh_f32 if src.fpfh_f32 is not None else _feature_rows(src.pcd_fpfh),
+            tgt.fpfh_f32 if tgt.fpfh_f32 is not None else _feature_rows(tgt.pcd_fpfh),
+            mutual_filter,
+        )
+    elif HAS_NUMBA:
+        # faissが無い場合はnumbaの並列全探索カーネルでフォールバックする
+        corres_np = _match_features_numba(
+            src.fpfh_f32 if src.fpfh_f32 is not None else _feature_rows(src.pcd_fpfh),
+            tgt.fpfh_f32 if tgt.fpfh_f32 is not None else _feature_rows(tgt.pcd_fpfh),
+            mutual_filter,
+        )
+    else:
+        corres = pipelines.registration.correspondences_from_features(src.pcd_fpfh, tgt.pcd_fpfh, mutual_filter)
+        corres_np = np.asarray(corres)
 
     # ノイズ（ランダムな偽対応点）の混入
     if noise_ratio > 0:
@@ -192,6 +536,205 @@ def compute_step_transformation(
         return res
 
 
+def compute_batch_transformations(
+    p_src: np.ndarray,
+    p_tgt: np.ndarray,
+    batch_size: int,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """対応点からKabschアルゴリズムの変換仮説をバッチ一括で生成する。
+
+    compute_step_transformation のバッチ版。B個の仮説それぞれの
+    3点サンプリング・重心計算・共分散行列・SVDを、Pythonループではなく
+    (B, 3, 3) テンソルに対するNumPyのバッチ行列演算として一括実行する。
+    イテレーションごとのPythonオーバーヘッド（関数呼び出し、小さな配列の
+    確保）が仮説B個あたり1回に償却される。
+
+    Args:
+        p_src: 対応点順に並んだソース点の配列 (N, 3)
+        p_tgt: 対応点順に並んだターゲット点の配列 (N, 3)
+        batch_size: 生成する仮説数 B
+        rng: 乱数生成器。Noneの場合は新規作成
+
+    Returns:
+        4x4同次変換行列のバッチ (B, 4, 4)。縮退・数値不安定な仮説は
+        単位行列に置き換えられる（フィットネス評価で淘汰される）
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    n = len(p_src)
+
+    # 3点サンプリング: N >> 3 ではインデックスの重複は確率的に稀で、
+    # 発生しても縮退仮説としてフィットネス評価で淘汰されるため、
+    # 非復元抽出のコストを払わず高速な復元抽出を使う
+    samples = rng.integers(0, n, size=(batch_size, 3))
+    p = p_src[samples]  # (B, 3, 3)
+    q = p_tgt[samples]
+
+    identity_batch = np.tile(np.eye(4), (batch_size, 1, 1))
+    try:
+        centroid_p = p.mean(axis=1, keepdims=True)
+        centroid_q = q.mean(axis=1, keepdims=True)
+        pc = p - centroid_p
+        qc = q - centroid_q
+
+        # 共分散行列とSVDをバッチで計算: H = P^T @ Q, R = V @ U^T
+        H = pc.transpose(0, 2, 1) @ qc
+        U, _, Vt = np.linalg.svd(H)
+        R = Vt.transpose(0, 2, 1) @ U.transpose(0, 2, 1)
+
+        # 反射の補正: det(R) < 0 の仮説のみ鏡像反転を修正
+        flip = np.linalg.det(R) < 0
+        if np.any(flip):
+            Vt[flip, 2, :] *= -1
+            R[flip] = Vt[flip].transpose(0, 2, 1) @ U[flip].transpose(0, 2, 1)
+
+        t = centroid_q.squeeze(1) - np.einsum("bij,bj->bi", R, centroid_p.squeeze(1))
+
+        transforms = identity_batch
+        transforms[:, :3, :3] = R
+        transforms[:, :3, 3] = t
+
+        # 数値安定性チェック: NaN/Infを含む仮説は単位行列にフォールバック
+        bad = ~np.isfinite(transforms).all(axis=(1, 2))
+        if np.any(bad):
+            transforms[bad] = np.eye(4)
+        return transforms
+    except np.linalg.LinAlgError:
+        # SVDが収束しない等のエラー時は単位行列のバッチを返してクラッシュを回避
+        return np.tile(np.eye(4), (batch_size, 1, 1))
+
+
+def evaluate_inlier_ratio_batch(
+    p_src: np.ndarray,
+    p_tgt: np.ndarray,
+    transforms: np.ndarray,
+    dist_thresh_sq: float,
+) -> np.ndarray:
+    """変換仮説のバッチをインライア率で一括評価する。
+
+    evaluate_inlier_ratio_fast のバッチ版。B個の仮説の変換適用と
+    平方距離の閾値判定を (B, N, 3) のテンソル演算として一括実行する。
+
+    Args:
+        p_src: 対応点順に並んだソース点の配列 (N, 3)
+        p_tgt: 対応点順に並んだターゲット点の配列 (N, 3)
+        transforms: 4x4変換行列のバッチ (B, 4, 4)
+        dist_thresh_sq: 距離閾値の2乗
+
+    Returns:
+        各仮説のインライア率の配列 (B,)
+    """
+    if len(p_src) == 0:
+        return np.zeros(len(transforms))
+
+    R = transforms[:, :3, :3].astype(p_src.dtype, copy=False)
+    t = transforms[:, :3, 3].astype(p_src.dtype, copy=False)
+
+    # 全仮説の変換適用と平方距離計算を1回のeinsumで実行
+    transformed = np.einsum("nj,bij->bni", p_src, R) + t[:, None, :]
+    diff = transformed - p_tgt[None, :, :]
+    dists_sq = np.einsum("bni,bni->bn", diff, diff)
+    return (dists_sq < dist_thresh_sq).sum(axis=1) / len(p_src)
+
+
+def run_ransac_batched(
+    src: Ply,
+    tgt: Ply,
+    correspondences: o3d.utility.Vector2iVector,
+    voxel_size: float,
+    iteration: int = 10000,
+    batch_size: int = 64,
+    confidence: float = 0.999,
+) -> pipelines.registration.RegistrationResult:
+    """仮説生成と検証をバッチ化したNumPy実装のRANSACを実行する。
+
+    compute_step_transformation + evaluate_inlier_ratio をイテレーションごとに
+    呼び出す代わりに、batch_size個の仮説をまとめて生成・評価する。
+    バッチごとにベストスコアを更新し、compute_required_iterations による
+    適応的な収束判定で早期終了する。
+
+    Args:
+        src: ソース点群
+        tgt: ターゲット点群
+        correspondences: 対応点ペアのリスト
+        voxel_size: ボクセルサイズ（距離閾値の算出に使用、閾値 = voxel_size * 1.5）
+        iteration: 最大イテレーション数（= 評価する仮説の総数上限）
+        batch_size: 1バッチあたりの仮説数
+        confidence: 適応的収束判定の信頼度
+
+    Returns:
+        RegistrationResult: ベストの変換行列とインライア率（fitness）を含む結果。
+                           対応点が3点未満の場合は単位行列（fitness=0.0）を返す
+    """
+    corres_np = np.asarray(correspondences)
+
+    res = pipelines.registration.RegistrationResult()
+    res.transformation = np.eye(4)
+    res.fitness = 0.0
+    if len(corres_np) < 3:
+        return res
+
+    # 対応点の座標をループ外で1回だけ抽出（float32でメモリ帯域を半減）
+    p_src = np.asarray(src.pcd_down.points)[corres_np[:, 0]].astype(np.float32)
+    p_tgt = np.asarray(tgt.pcd_down.points)[corres_np[:, 1]].astype(np.float32)
+
+    dist_thresh = voxel_size * 1.5
+    dist_thresh_sq = dist_thresh * dist_thresh
+    rng = np.random.default_rng()
+
+    best_fitness = 0.0
+    best_transform = np.eye(4)
+    evaluated = 0
+
+    while evaluated < iteration:
+        batch = min(batch_size, iteration - evaluated)
+        transforms = compute_batch_transformations(p_src, p_tgt, batch, rng)
+        fitness = evaluate_inlier_ratio_batch(p_src, p_tgt, transforms, dist_thresh_sq)
+
+        best_idx = int(np.argmax(fitness))
+        if fitness[best_idx] > best_fitness:
+            best_fitness = float(fitness[best_idx])
+            best_transform = transforms[best_idx]
+        evaluated += batch
+
+        # 適応的早期終了: 現在のベストのインライア率から必要試行回数を再計算
+        if evaluated >= compute_required_iterations(best_fitness, confidence, 3, iteration):
+            break
+
+    res.transformation = np.asarray(best_transform, dtype=np.float64)
+    res.fitness = best_fitness
+    return res
+
+
+def compute_required_iterations(
+    inlier_ratio: float,
+    confidence: float = 0.99,
+    sample_size: int = 3,
+    max_iteration: int = 10000,
+) -> int:
+    """RANSAC理論に基づく適応的な必要イテレーション数を計算する。
+
+    インライア率 w のとき、サンプルサイズ s の全点がインライアとなる確率は w^s。
+    信頼度 p で少なくとも1回は全インライアのサンプルを引くために必要な試行回数は
+    N = log(1 - p) / log(1 - w^s) で与えられる。ベストスコアが更新されるたびに
+    N を再計算すれば、インライア率が高いほど早くループを打ち切れる。
+
+    Args:
+        inlier_ratio: 現在のベストのインライア率（0.0〜1.0）
+        confidence: 信頼度（0.0〜1.0）
+        sample_size: 1回の試行でサンプリングする対応点数（通常3）
+        max_iteration: イテレーション数の上限。インライア率が極端に低い場合に返す
+
+    Returns:
+        必要なイテレーション数（max_iterationを超えない）
+    """
+    if inlier_ratio < 0.01:
+        return max_iteration
+    required = int(np.log(1 - confidence) / np.log(1 - inlier_ratio**sample_size))
+    return min(required, max_iteration)
+
+
 def evaluate_inlier_ratio(
     src: Ply,
     tgt: Ply,
@@ -226,14 +769,17 @@ def evaluate_inlier_ratio(
     p_src = src_points[corres[:, 0]]
     p_tgt = tgt_points[corres[:, 1]]
 
-    # ソース点に変換行列を適用: p' = R @ p + t
-    p_src_transformed = (transform[:3, :3] @ p_src.T).T + transform[:3, 3]
+    # ソース点に変換行列を適用: p' = p @ R.T + t （(R @ p.T).T と等価だが転置が1回少ない）
+    p_src_transformed = p_src @ transform[:3, :3].T + transform[:3, 3]
 
-    # 変換後のソース点とターゲット点のユークリッド距離を計算
-    dists = np.linalg.norm(p_src_transformed - p_tgt, axis=1)
+    # 最適化: norm(v) < thresh を sum(v^2) < thresh^2 に置き換えてsqrtを回避。
+    # einsumによる平方距離計算は中間配列を作らず、分岐のない
+    # SIMDベクトル化しやすい連続メモリアクセスになる
+    diff = p_src_transformed - p_tgt
+    dists_sq = np.einsum("ij,ij->i", diff, diff)
 
     # インライア率 = 距離が閾値未満のペア数 / 全対応点数
-    return np.sum(dists < dist_thresh) / len(corres)
+    return np.sum(dists_sq < dist_thresh * dist_thresh) / len(corres)
 
 
 def evaluate_inlier_ratio_fast(
@@ -265,13 +811,28 @@ def evaluate_inlier_ratio_fast(
     if len(p_src) == 0:
         return 0.0
 
-    # 最適化: p @ R.T + t は (R @ p.T).T + t と等価だが、転置が1回少ない
-    R = transform[:3, :3]
-    t = transform[:3, 3]
+    # 最適化: p @ R.T + t は (R @ p.T).T + t と等価だが、転置が1回少ない。
+    # 変換行列を点群配列のdtypeに合わせることで、呼び出し側がfloat32の
+    # キャッシュを渡した場合にfloat64への暗黙の昇格（メモリ帯域2倍）を防ぐ
+    R = transform[:3, :3].astype(p_src.dtype, copy=False)
+    t = transform[:3, 3].astype(p_src.dtype, copy=False)
+
+    # 最適化: numbaが利用可能なら中間配列を確保しないJITカーネルを使用
+    if HAS_NUMBA:
+        count = _count_inliers_jit(
+            np.ascontiguousarray(p_src),
+            np.ascontiguousarray(p_tgt),
+            np.ascontiguousarray(R),
+            np.ascontiguousarray(t),
+            dist_thresh_sq,
+        )
+        return count / len(p_src)
     p_src_transformed = p_src @ R.T + t
 
-    # 最適化: 平方距離を使用して sqrt を回避
-    dists_sq = np.sum((p_src_transformed - p_tgt) ** 2, axis=1)
+    # 最適化: 平方距離を使用して sqrt を回避。
+    # einsumは (d**2).sum(axis=1) と異なり二乗の中間配列を確保しない
+    diff = p_src_transformed - p_tgt
+    dists_sq = np.einsum("ij,ij->i", diff, diff)
 
     # インライア率 = 距離が閾値未満のペア数 / 全対応点数
     return np.sum(dists_sq < dist_thresh_sq) / len(p_src)
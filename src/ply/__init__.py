@@ -1,3 +1,3 @@
-from .ply import Ply
+from .ply import Ply, load_ply_pair
 
-__all__ = ["Ply"]
+__all__ = ["Ply", "load_ply_pair"]
@@ -0,0 +1,23 @@
+"""Open3Dの実行デバイス選択ユーティリティ。
+
+テンソル版パイプライン（FPFH計算・ICPなど）をCUDAが使える環境では
+GPUで、それ以外ではCPUで実行するためのデバイス選択を一元化する。
+"""
+
+from functools import lru_cache
+
+import open3d as o3d
+
+
+@lru_cache(maxsize=1)
+def preferred_device() -> o3d.core.Device:
+    """テンソル版パイプラインで使用するデバイスを返す。
+
+    CUDAビルドかつGPUが利用可能な場合は CUDA:0、それ以外は CPU:0 を返す。
+    最適化: cuda.is_available() はドライバ問い合わせを伴うため、
+    結果をプロセス内でキャッシュして2回目以降の呼び出しを定数時間にする。
+
+    Returns:
+        o3d.core.Device: 選択されたデバイス
+    """
+    return o3d.core.Device("CUDA:0") if o3d.core.cuda.is_available() else o3d.core.Device("CPU:0")
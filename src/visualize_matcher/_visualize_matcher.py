@@ -21,6 +21,7 @@ from __future__ import annotations
 import copy
 import time
 from dataclasses import dataclass
+from functools import partial
 from typing import TYPE_CHECKING, Protocol
 
 import numpy as np
@@ -30,10 +31,10 @@ import open3d.visualization.rendering as o3dv_rendering
 
 from matcher.icp import refine_registration
 from matcher.ransac import (
+    compute_batch_transformations,
     compute_feature_correspondences,
-    compute_step_transformation,
-    evaluate_inlier_ratio,
-    evaluate_inlier_ratio_fast,
+    compute_required_iterations,
+    evaluate_inlier_ratio_batch,
     global_registration,
 )
 from utils.setup_logging import setup_logging
@@ -210,15 +211,6 @@ class VisualizeMatcher:
         self.source_base_center = np.asarray(self.source.pcd.get_center())
         self.rng = np.random.default_rng()
 
-        # 変換前の点群を保持（各イテレーションでのプレビュー表示に使用）
-        # 最適化: PointCloudオブジェクト全体ではなく点座標のみをnumpy配列として保存
-        self.source_points_orig = np.asarray(self.source.pcd.points).copy()
-        self.source_colors_orig = np.asarray(self.source.pcd.colors).copy() if self.source.pcd.has_colors() else None
-
-        # 表示用の再利用可能なPointCloudオブジェクト（deep copyを避けるため）
-        # 色は_update_sceneで黄色に設定されるため、ここでは色を設定しない
-        self.temp_display_pcd = o3d.geometry.PointCloud()
-
         # Open3D GUIアプリケーションの初期化
         self.app = o3dv_gui.Application.instance
         self.app.initialize()
@@ -247,8 +239,21 @@ class VisualizeMatcher:
         self.settings = settings
         self.is_logging = is_logging
         self.view_manager.window.post_redraw()
+        # 最適化: 遅延前処理（defer_preprocess=True）のPlyが渡された場合に備えて
+        # バックグラウンドで前処理を進める。ウィンドウはフル解像度の点群を
+        # 即座に表示し、ダウンサンプリングとFPFH計算は描画と並行して走る
+        self.app.run_in_thread(self._prepare_worker)
         self.app.run()
 
+    def _prepare_worker(self) -> None:
+        """ソース/ターゲットの前処理をバックグラウンドで完了させるワーカー関数。
+
+        Plyのprepare()は冪等のため、前処理済み（defer_preprocess=False）の
+        場合は即座に戻る。
+        """
+        self.source.prepare()
+        self.target.prepare()
+
     # ================================
     # ボタンイベントハンドラ
     # ================================
@@ -298,6 +303,10 @@ class VisualizeMatcher:
         ソース点群の重心を回転中心として変換を適用する。
         レジストレーションアルゴリズムのテスト用に初期位置ずれを生成する。
         """
+        # 前処理が未完了（遅延中）の場合はここで完了を待つ。
+        # pcd と pcd_down の両方に同じ変換を適用して整合性を保つため
+        self.source.prepare()
+
         # X/Y/Z各軸の回転角をランダム生成
         angles = self.rng.uniform(*self.RANDOM_ROTATION_RANGE_RAD, 3)
 
@@ -326,11 +335,7 @@ class VisualizeMatcher:
         self.source.pcd.transform(transformation)
         self.source.pcd_down.transform(transformation)
 
-        # 変換後の状態を保存（RANSACの各イテレーション表示の基準となる）
-        # 最適化: 点座標のみを保存
-        self.source_points_orig = np.asarray(self.source.pcd.points).copy()
-
-        # 3Dシーンを更新
+        # 3Dシーンを更新（シーン上のソース点群が各イテレーション表示の基準となる）
         self._update_scene(self.source.pcd)
         self.view_manager.label.text = "Random Transformed"
         self.view_manager.info_label.text = ""  # ステップログをクリア
@@ -343,41 +348,33 @@ class VisualizeMatcher:
     def _run_ransac_manual_worker(self) -> None:
         """RANSACをステップバイステップで実行するワーカー関数（別スレッドで実行）。
 
-        各イテレーションで:
-            1. 対応点から3点をランダムサンプリング
-            2. Kabschアルゴリズムで変換行列を推定
-            3. インライア率を計算してベストを更新
-            4. UIスレッドに描画更新を通知（設定可能なdelay、デフォルト1ms）
-            5. (オプション) 早期停止条件をチェック
+        update_interval個の仮説を1バッチとして:
+            1. バッチ分の3点サンプリングとKabsch変換推定をNumPyで一括実行
+            2. バッチ分のインライア率を一括評価してベストを更新
+            3. UIスレッドにバッチのベスト仮説の描画更新を通知
+            4. (オプション) 早期停止条件をチェック
+
+        GUI更新は元々update_intervalごとだったため描画頻度は変わらないが、
+        仮説ごとのPython関数呼び出しと小さな配列確保がバッチ単位に償却される。
         """
         if self.settings is None:
             return
 
-        def compute_required_iterations(inlier_ratio: float, confidence: float = 0.99, sample_size: int = 3) -> int:
-            """RANSAC理論に基づく必要イテレーション数を計算。
-
-            Args:
-                inlier_ratio: インライア率（0.0〜1.0）
-                confidence: 信頼度（0.0〜1.0）
-                sample_size: サンプルサイズ（通常3）
-
-            Returns:
-                必要なイテレーション数
-            """
-            if inlier_ratio < 0.01:
-                return self.settings.ransac_iteration
-            # N = log(1 - confidence) / log(1 - inlier_ratio^sample_size)
-            return int(np.log(1 - confidence) / np.log(1 - inlier_ratio**sample_size))
+        # 前処理が未完了（遅延中）の場合はここで完了を待つ
+        self.source.prepare()
+        self.target.prepare()
 
         # FPFH特徴量ベースの対応点を計算（ノイズ混入あり）
         corres = compute_feature_correspondences(self.source, self.target, noise_ratio=self.settings.noise_ratio)
 
-        # 最適化: 対応点を事前抽出（ループ外で1回のみ実行）
+        # 最適化: 対応点を事前抽出（ループ外で1回のみ実行）。
+        # Open3Dのレガシー点群はfloat64固定だが、インライア評価のNumPy計算は
+        # float32で十分な精度のため、キャッシュをfloat32に落としてメモリ帯域を半減する。
+        # 注意: pcd_down はランダム変換やRANSAC/ICPの結果適用でインプレースに
+        # 動くため、前処理時のスナップショットは使わず必ず現在の座標から抽出する
         corres_np = np.asarray(corres)
-        src_points = np.asarray(self.source.pcd_down.points)
-        tgt_points = np.asarray(self.target.pcd_down.points)
-        p_src_cache = src_points[corres_np[:, 0]]
-        p_tgt_cache = tgt_points[corres_np[:, 1]]
+        p_src_cache = np.asarray(self.source.pcd_down.points)[corres_np[:, 0]].astype(np.float32)
+        p_tgt_cache = np.asarray(self.target.pcd_down.points)[corres_np[:, 1]].astype(np.float32)
 
         # 最適化: 距離閾値の2乗を事前計算
         dist_thresh = self.settings.voxel_size * 1.5
@@ -385,10 +382,19 @@ class VisualizeMatcher:
 
         iter_num = 0
         max_iter = self.settings.ransac_iteration
+        batch_size = max(1, self.settings.update_interval)
+        rng = np.random.default_rng()
 
         best_result = None
         best_fitness = -1.0
 
+        # 最適化: メソッド参照をループ外で一度だけ束縛する。GUI更新の通知は
+        # lambdaのクロージャ（デフォルト引数の辞書確保込み）ではなく、
+        # C実装で引数をフラットに保持するfunctools.partialで行う
+        post = self.app.post_to_main_thread
+        window = self.view_manager.window
+        update_viz = self._update_viz
+
         logger.info(f"Start RANSAC: {len(corres)} correspondences (Noise Ratio: {self.settings.noise_ratio})")
 
         while iter_num < max_iter:
@@ -397,77 +403,55 @@ class VisualizeMatcher:
                 logger.info(f"RANSAC stopped by user at iteration {iter_num}/{max_iter}")
                 if best_result is not None:
                     # 現在のベスト結果で終了
-                    self.app.post_to_main_thread(
-                        self.view_manager.window,
-                        lambda res=best_result, it=iter_num, val=best_fitness, b_fit=best_fitness: self._update_viz(
-                            res,
-                            it,
-                            val,
-                            b_fit,
-                        ),
-                    )
+                    post(window, partial(update_viz, best_result, iter_num, best_fitness, best_fitness))
                 break
 
-            iter_num += 1
-
-            # 対応点から3点をサンプリングしてKabschアルゴリズムで変換行列を推定
-            result = compute_step_transformation(self.source, self.target, corres)
-
-            # 最適化: 事前抽出した点とevaluate_inlier_ratio_fast()を使用
-            w_current = evaluate_inlier_ratio_fast(
-                p_src_cache,
-                p_tgt_cache,
-                result.transformation,
-                dist_thresh_sq,
-            )
+            # 最適化: update_interval個の仮説の生成（3点サンプリング + Kabsch）と
+            # インライア率評価をNumPyのバッチ演算として一括実行する
+            batch = min(batch_size, max_iter - iter_num)
+            transforms = compute_batch_transformations(p_src_cache, p_tgt_cache, batch, rng)
+            fitness_batch = evaluate_inlier_ratio_batch(p_src_cache, p_tgt_cache, transforms, dist_thresh_sq)
+            iter_num += batch
+
+            # バッチ内のベスト仮説をレガシー形式の結果に詰める（描画・最終適用用）
+            batch_best = int(np.argmax(fitness_batch))
+            w_current = float(fitness_batch[batch_best])
+            result = o3d.pipelines.registration.RegistrationResult()
+            result.transformation = np.asarray(transforms[batch_best], dtype=np.float64)
             result.fitness = w_current
 
             # ベストスコアの更新
-            is_new_best = best_result is None or w_current > best_fitness
-            if is_new_best:
+            if best_result is None or w_current > best_fitness:
                 best_result = result
                 best_fitness = w_current
 
             # 早期停止チェック（設定で有効化されている場合）
             if self.settings.early_stop_enabled and best_fitness > self.settings.early_stop_threshold:
-                required_iters = compute_required_iterations(best_fitness, self.settings.early_stop_confidence, 3)
+                required_iters = compute_required_iterations(
+                    best_fitness,
+                    self.settings.early_stop_confidence,
+                    3,
+                    max_iter,
+                )
                 if iter_num >= required_iters:
                     logger.info(
                         f"Early stop at iteration {iter_num}/{max_iter} "
                         f"(fitness: {best_fitness:.4f}, required: {required_iters})",
                     )
                     # 最終状態をGUIに反映
-                    self.app.post_to_main_thread(
-                        self.view_manager.window,
-                        lambda res=best_result, it=iter_num, val=best_fitness, b_fit=best_fitness: self._update_viz(
-                            res,
-                            it,
-                            val,
-                            b_fit,
-                        ),
-                    )
+                    post(window, partial(update_viz, best_result, iter_num, best_fitness, best_fitness))
                     # 残りのイテレーションをスキップして終了
                     break
 
-            # GUI更新（update_intervalごと、またはベスト更新時）
-            should_update = (iter_num % self.settings.update_interval == 0) or is_new_best
-            if should_update:
-                self.app.post_to_main_thread(
-                    self.view_manager.window,
-                    lambda res=result, it=iter_num, val=w_current, b_fit=best_fitness: self._update_viz(
-                        res,
-                        it,
-                        val,
-                        b_fit,
-                    ),
-                )
+            # GUI更新（バッチごとに1回 = 従来のupdate_intervalごとと同じ頻度）
+            post(window, partial(update_viz, result, iter_num, w_current, best_fitness))
 
-                # フレームレート調整（設定可能なdelay、デフォルト10ms）
-                time.sleep(self.settings.visualization_delay)
+            # フレームレート調整（設定可能なdelay、デフォルト10ms）
+            time.sleep(self.settings.visualization_delay)
 
         # 全イテレーション完了後、ベスト結果で最終変換を適用
         self.last_ransac_result = best_result
-        self.app.post_to_main_thread(self.view_manager.window, lambda: self._finalize_ransac(best_result))
+        post(window, partial(self._finalize_ransac, best_result))
 
     def _update_viz(self, result, iter_num, w, best_fit):
         """RANSACの各イテレーション結果を3Dシーンに反映する（UIスレッドで実行）。
@@ -478,12 +462,12 @@ class VisualizeMatcher:
             w: 現在のインライア率
             best_fit: これまでの最良インライア率
         """
-        # 最適化: deep copyの代わりに、事前に保存した点座標に変換を適用して表示用オブジェクトを更新
-        R = result.transformation[:3, :3]
-        t = result.transformation[:3, 3]
-        transformed_points = self.source_points_orig @ R.T + t
-        self.temp_display_pcd.points = o3d.utility.Vector3dVector(transformed_points)
-        self._update_scene(self.temp_display_pcd)
+        # 最適化: 点群を再アップロードせず、シーン上のソースジオメトリの
+        # モデル行列だけを set_geometry_transform で差し替える。仮説の変換は
+        # ワーカー開始時点の pcd_down 座標（= シーン上のソースと同じ基準）に
+        # 対するものなので、GPU側の剛体変換だけでプレビューが完結し、
+        # 点座標の orig @ R.T + t 計算と Vector3dVector 再アップロードが不要になる
+        self.view_manager.scene.set_geometry_transform(SOURCE_NAME, result.transformation)
 
         # ステータスラベルの更新
         self.view_manager.label.text = f"Iter: {iter_num}"
@@ -501,9 +485,8 @@ class VisualizeMatcher:
             # ベスト変換行列をソース点群に適用（以後のICP処理の起点となる）
             self.source.pcd.transform(result.transformation)
             self.source.pcd_down.transform(result.transformation)
-            # 変換後の状態を保存
-            # 最適化: 点座標のみを保存
-            self.source_points_orig = np.asarray(self.source.pcd.points).copy()
+            # ジオメトリを再アップロードしてモデル行列を単位行列に戻す
+            # （プレビュー中の set_geometry_transform の残留を防ぐ）
             self._update_scene(self.source.pcd)
             status = "Stopped" if self.should_stop_ransac else "Done"
             self.view_manager.label.text = f"{status}. Final Best: {result.fitness:.4f}"
@@ -520,6 +503,10 @@ class VisualizeMatcher:
         if self.settings is None:
             return
 
+        # 前処理が未完了（遅延中）の場合はここで完了を待つ
+        self.source.prepare()
+        self.target.prepare()
+
         # global_registrationを直接呼び出し
         # Plyオブジェクトの初期化時に使用したvoxel_sizeを使用
         result = global_registration(
@@ -533,7 +520,7 @@ class VisualizeMatcher:
         self.last_ransac_result = result
 
         # main threadでgeometryを更新
-        self.app.post_to_main_thread(self.view_manager.window, lambda res=result: self._apply_result(res))
+        self.app.post_to_main_thread(self.view_manager.window, partial(self._apply_result, result))
 
         # 完了メッセージを表示
         def update_label() -> None:
@@ -554,7 +541,7 @@ class VisualizeMatcher:
             return
         # 初期変換は単位行列: RANSAC結果は既にpcdに適用済みなので追加の差分を求める
         res = refine_registration(self.source, self.target, np.eye(4), self.source.voxel_size)
-        self.app.post_to_main_thread(self.view_manager.window, lambda: self._finalize_icp(res))
+        self.app.post_to_main_thread(self.view_manager.window, partial(self._finalize_icp, res))
 
     def _finalize_icp(self, result):
         """ICP完了後の最終処理。ICP結果の変換行列をソース点群に適用する。
@@ -576,12 +563,19 @@ class VisualizeMatcher:
         """3Dシーン上のソース点群ジオメトリを更新する。
 
         既存のソースジオメトリを削除し、新しい点群を追加する。
+        点座標そのものが変わった場合（ランダム変換やRANSAC/ICPの結果適用）に
+        使用する。剛体変換のプレビューだけなら再アップロードは不要で、
+        _update_viz が set_geometry_transform でモデル行列のみ差し替える。
+        再追加によりモデル行列は単位行列にリセットされる。
+
+        最適化: ソース色（黄色）の塗り直しは点数に比例するコストのため、
+        色が未設定または点数が変わった場合のみ実行する。
 
         Args:
             pcd: 表示する点群オブジェクト
         """
-        # ソース点群の色を黄色に設定（更新時も色を維持）
-        pcd.paint_uniform_color([1, 0.706, 0])
+        if not pcd.has_colors() or len(pcd.colors) != len(pcd.points):
+            pcd.paint_uniform_color([1, 0.706, 0])
 
         if self.view_manager.scene.has_geometry(SOURCE_NAME):
             self.view_manager.scene.remove_geometry(SOURCE_NAME)
@@ -605,12 +599,7 @@ class VisualizeMatcher:
         self.source.pcd.transform(transformation)
         self.source.pcd_down.transform(transformation)
 
-        # ソース点群の色を黄色に設定
-        self.source.pcd.paint_uniform_color([1, 0.706, 0])
-
-        if self.view_manager.scene.has_geometry(SOURCE_NAME):
-            self.view_manager.scene.remove_geometry(SOURCE_NAME)
-        self.view_manager.scene.add_geometry(SOURCE_NAME, self.source.pcd, self.view_manager.material)
+        self._update_scene(self.source.pcd)
 
         self.view_manager.label.text = label
         self.view_manager.window.post_redraw()
@@ -619,15 +608,16 @@ class VisualizeMatcher:
 if __name__ == "__main__":
     from pathlib import Path
 
-    from ply import Ply
+    from ply import load_ply_pair
 
     voxel_size = 0.3
     base_path = Path(__file__).parent.parent.parent / "3d_data"
     src_path = base_path / "sample.ply"
     tgt_path = base_path / "target.ply"
 
-    src_ply = Ply(src_path, voxel_size)
-    tgt_ply = Ply(tgt_path, voxel_size)
+    # 遅延前処理: ウィンドウを即座に表示し、ダウンサンプリングとFPFH計算は
+    # invoke() がバックグラウンドスレッドで進める
+    src_ply, tgt_ply = load_ply_pair(src_path, tgt_path, voxel_size, defer_preprocess=True)
 
     visualizer = VisualizeMatcher(src_ply, tgt_ply)
 